@@ -1,254 +1,736 @@
 import sqlite3
 import os
+import hashlib
+import multiprocessing
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+import pymupdf
 import pdfplumber
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Tuple
+
+# Applied to every connection on open. WAL + synchronous=NORMAL avoids an fsync
+# per commit and lets searches read while the indexer is writing.
+SQLITE_PRAGMAS = (
+    # Only takes effect on a fresh database, so it must run before anything
+    # (including the switch to WAL) writes the header. A no-op otherwise.
+    "PRAGMA page_size=4096",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=536870912",  # 512MB, lets FTS lookups read straight from the page cache
+    "PRAGMA busy_timeout=60000",
+)
+
+# Rows written per transaction during reindex_all
+COMMIT_BATCH_SIZE = 1000
+# Share of the index that must change before reindex_all rebuilds pdf_fts in
+# one pass instead of updating it row by row
+FTS_REBUILD_FRACTION = 0.25
+
+# reindex_all runs inside a multi-threaded server (watcher, executor threads,
+# the extractor's pipes); forking that process can copy a held lock into the
+# child, so extraction workers are started fresh instead.
+_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Bytes hashed for the change fingerprint stored in file_meta
+FINGERPRINT_BYTES = 65536
+
+# In-memory search result cache
+SEARCH_CACHE_SIZE = 128
+SEARCH_CACHE_TTL = 60  # seconds
+
+# Exact hits needed before the fuzzy pass is skipped
+SEARCH_MIN_HITS = 10
+# Upper bound on edits between a query term and a vocabulary correction
+FUZZY_MAX_EDITS = 2
+
+# Scope name -> path pattern
+SCOPE_PATTERNS = {
+    "import": "%/Import_Policy/%",
+    "export": "%/Export_Policy/%",
+    "import_extra": "%/Import_Policy_Extra/%",
+    "export_extra": "%/Export_Policy_Extra/%"
+}
+
+def _extract_text(full_path: str) -> str:
+    """
+    Extract and whitespace-normalise the text of a PDF.
+    Module-level so it can be pickled into a ProcessPoolExecutor worker.
+
+    Uses PyMuPDF (C-backed, much faster) and falls back to pdfplumber for
+    files it cannot handle. Layout is thrown away by the normalisation anyway.
+    """
+    try:
+        with pymupdf.open(full_path) as doc:
+            full_text = "\n".join(page.get_text("text") for page in doc)
+    except Exception as e:
+        print(f"PyMuPDF failed for {full_path}, falling back to pdfplumber: {e}")
+        with pdfplumber.open(full_path) as pdf:
+            text_content = []
+            for page in pdf.pages:
+                extracted = page.extract_text()
+                if extracted:
+                    text_content.append(extracted)
+            full_text = "\n".join(text_content)
+
+    # Simple content cleaning for better searching (one pass, no token list)
+    return _WHITESPACE_RE.sub(" ", full_text).strip()
+
+def _fingerprint(full_path: str) -> bytes:
+    """Cheap content fingerprint: blake2b of the first FINGERPRINT_BYTES of the file."""
+    with open(full_path, "rb") as f:
+        return hashlib.blake2b(f.read(FINGERPRINT_BYTES), digest_size=16).digest()
+
+def _classify(full_path: str, mtime: float, size: int, known: Optional[tuple]) -> Tuple[str, Optional[bytes]]:
+    """
+    Compare a file against its (mtime, size, fprint) row from file_meta.
+    Returns ("unchanged" | "touched" | "changed", fprint). "touched" means only
+    the mtime moved (touch, rsync, re-download of identical bytes) and the PDF
+    does not need to be parsed again.
+    """
+    if known and known[0] == mtime:
+        return "unchanged", known[2]
+    fprint = _fingerprint(full_path)
+    if known and known[1] == size and known[2] == fprint:
+        return "touched", fprint
+    return "changed", fprint
+
+class IndexedDoc(NamedTuple):
+    path: str  # web path, e.g. /files/Import_Policy/foo.pdf
+    filename: str
+    content: str
+    mtime: float
+    size: int
+    fprint: bytes
+
+def iter_pdfs(base_path: str, _rel_dir: str = ""):
+    """
+    Recursively yield (full_path, rel_path, mtime, size) for every PDF under base_path.
+    rel_path uses '/' separators. Uses os.scandir so stat data comes from the
+    directory listing where the platform provides it.
+    """
+    try:
+        with os.scandir(base_path) as it:
+            entries = list(it)
+    except OSError:
+        return
+
+    for entry in entries:
+        rel_path = f"{_rel_dir}/{entry.name}" if _rel_dir else entry.name
+        try:
+            # Like os.walk, don't descend into symlinked directories (a link
+            # loop would otherwise recurse until RecursionError)
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_pdfs(entry.path, rel_path)
+            elif entry.name.endswith(".pdf") and entry.is_file():
+                st = entry.stat()
+                yield entry.path, rel_path, st.st_mtime, st.st_size
+        except OSError:
+            continue
+
+def build_file_tree(pdfs) -> Dict[str, List[Dict]]:
+    """
+    Group iter_pdfs() tuples into the {folder: [file, ...]} shape served by /api/files.
+    Only PDFs directly inside a top-level folder are listed.
+    """
+    tree: Dict[str, List[Dict]] = {}
+    for _, rel_path, mtime, size in pdfs:
+        folder, _, name = rel_path.partition("/")
+        if not name or "/" in name:
+            continue
+        tree.setdefault(folder, []).append({
+            "name": name,
+            "path": f"/files/{rel_path}",
+            "size": size,
+            "modified": mtime
+        })
+    for files in tree.values():
+        files.sort(key=lambda x: x['name'])
+    return tree
+
+def _tree_stamp(base_path: str) -> Optional[tuple]:
+    """
+    mtimes of base_path and its top-level folders. Adding, removing or renaming a
+    file changes its folder's mtime, so an unchanged stamp means an unchanged listing.
+    """
+    try:
+        stamp = [(base_path, os.stat(base_path).st_mtime)]
+        with os.scandir(base_path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stamp.append((entry.name, entry.stat().st_mtime))
+    except OSError:
+        return None
+    return tuple(sorted(stamp))
 
 class SearchIndexer:
     def __init__(self, db_path="dashboard/search_index.db"):
         self.db_path = db_path
+        # Bumped after every committed write; part of the search cache key
+        self._index_version = 0
+        self._search_cache = OrderedDict()
+        self._vocab = (-1, [])
+        self._cache_lock = threading.Lock()
+        # Connection pool: one connection per thread (WAL lets them read concurrently)
+        self._tls = threading.local()
+        self._pool: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        # /api/files listing, kept in step with indexing (see get_file_tree)
+        self.file_tree_cache: Dict[str, List[Dict]] = {}
+        self._tree_stamp: Optional[tuple] = None
+        # One reindex_all at a time; staged_docs is shared between runs
+        self._reindex_lock = threading.Lock()
         self.initialize_db()
 
+    def _invalidate_search_cache(self):
+        with self._cache_lock:
+            self._index_version += 1
+            self._search_cache.clear()
+
+    def get_file_tree(self, base_path: str) -> Dict[str, List[Dict]]:
+        """Cached folder listing; re-walked only when a folder mtime changes."""
+        stamp = _tree_stamp(base_path)
+        with self._cache_lock:
+            if stamp is not None and stamp == self._tree_stamp:
+                return self.file_tree_cache
+        tree = build_file_tree(iter_pdfs(base_path))
+        self._set_file_tree(tree, stamp)
+        return tree
+
+    def _set_file_tree(self, tree: Dict[str, List[Dict]], stamp: Optional[tuple]):
+        with self._cache_lock:
+            self.file_tree_cache = tree
+            self._tree_stamp = stamp
+
+    def _update_file_tree(self, relative_path: str, mtime: float, size: int):
+        """
+        Refresh one entry after index_file. In-place rewrites do not touch the
+        folder mtime, so the stamp check alone would miss them. Copy-on-write so
+        a listing being serialised elsewhere is never mutated.
+        """
+        folder, _, name = relative_path[len("/files/"):].partition("/")
+        if not name or "/" in name:
+            return
+        with self._cache_lock:
+            if folder not in self.file_tree_cache:
+                return
+            files = [f for f in self.file_tree_cache[folder] if f["name"] != name]
+            files.append({"name": name, "path": relative_path, "size": size, "modified": mtime})
+            files.sort(key=lambda x: x['name'])
+            self.file_tree_cache = {**self.file_tree_cache, folder: files}
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close() can run from the shutdown
+        # thread; otherwise each connection is used by the thread that opened it.
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """Per-thread connection, opened on first use and kept for the thread's lifetime."""
+        conn = getattr(self._tls, "conn", None)
+        if conn is None:
+            conn = self._tls.conn = self._connect()
+            with self._pool_lock:
+                self._pool.append(conn)
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """
+        Yields this thread's pooled connection. Commits on success and rolls
+        back on error. Not re-entrant: do not nest on the same thread.
+        """
+        conn = self._conn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Optimize and close every pooled connection (server shutdown)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+        for conn in pool:
+            try:
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except sqlite3.Error:
+                pass
+        # Threads that reconnect after close() get a fresh connection
+        self._tls = threading.local()
+
     def initialize_db(self):
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 c = conn.cursor()
+                # sqlite3 would run the DDL below in autocommit; one explicit
+                # transaction keeps a crash from leaving a half-migrated schema.
+                c.execute("BEGIN IMMEDIATE")
+                # Extracted text lives only in content_raw; pdf_fts is an external-content
+                # FTS5 table over it, so the text is not stored a second time.
+                c.execute("SELECT name, sql FROM sqlite_master WHERE name IN ('pdf_fts', 'content_raw', 'legacy_docs')")
+                existing = dict(c.fetchall())
+                # Also left behind by a migration interrupted before this ran
+                # in one transaction; reload it like a fresh one
+                legacy = "legacy_docs" if "legacy_docs" in existing else None
+                if "pdf_fts" in existing and "content=content_raw" not in existing["pdf_fts"]:
+                    # Older layouts kept their own copy of the text inside pdf_fts
+                    # (and possibly a path-keyed content_raw). Move it aside and reload.
+                    if legacy:
+                        c.execute("DROP TABLE pdf_fts")
+                    elif "content_raw" in existing:
+                        c.execute("ALTER TABLE content_raw RENAME TO legacy_docs")
+                        c.execute("DROP TABLE pdf_fts")
+                    else:
+                        c.execute("ALTER TABLE pdf_fts RENAME TO legacy_docs")
+                    legacy = "legacy_docs"
+                c.execute("""
+                    CREATE TABLE IF NOT EXISTS content_raw (
+                        id INTEGER PRIMARY KEY,
+                        path TEXT NOT NULL UNIQUE,
+                        filename TEXT,
+                        mtime REAL,
+                        content TEXT
+                    )
+                """)
                 # Enable FTS5 extension if possible (usually built-in)
                 c.execute("""
                     CREATE VIRTUAL TABLE IF NOT EXISTS pdf_fts USING fts5(
                         filename, 
                         content, 
                         path UNINDEXED, 
-                        mtime UNINDEXED
+                        mtime UNINDEXED,
+                        content=content_raw,
+                        content_rowid=id
                     )
                 """)
+                if legacy:
+                    c.execute(f"""
+                        INSERT OR IGNORE INTO content_raw (path, filename, mtime, content)
+                        SELECT path, filename, mtime, content FROM {legacy}
+                    """)
+                    c.execute(f"DROP TABLE {legacy}")
+                    self._rebuild_fts(c)
                 # Vocabulary table for fast term lookup (requires FTS5)
                 c.execute("""
                     CREATE VIRTUAL TABLE IF NOT EXISTS pdf_terms USING fts5vocab(pdf_fts, row)
                 """)
-                # Standard table to track modification times for incremental updates
+                # Standard table to track modification times for incremental updates.
+                # WITHOUT ROWID: the primary key b-tree holds the row itself, so the
+                # per-file "unchanged?" lookup is a single descent.
+                c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'file_meta'")
+                row = c.fetchone()
+                migrate_meta = row is not None and "WITHOUT ROWID" not in row[0].upper()
+                if migrate_meta:
+                    # Older databases: rowid table, possibly without size/fprint
+                    c.execute("PRAGMA table_info(file_meta)")
+                    old_columns = [r[1] for r in c.fetchall()]
+                    c.execute("ALTER TABLE file_meta RENAME TO file_meta_old")
                 c.execute("""
                     CREATE TABLE IF NOT EXISTS file_meta (
                         path TEXT PRIMARY KEY,
-                        mtime REAL
+                        mtime REAL,
+                        size INTEGER,
+                        fprint BLOB
+                    ) WITHOUT ROWID
+                """)
+                if migrate_meta:
+                    columns = ", ".join(col for col in ("path", "mtime", "size", "fprint") if col in old_columns)
+                    c.execute(f"INSERT INTO file_meta ({columns}) SELECT {columns} FROM file_meta_old")
+                    c.execute("DROP TABLE file_meta_old")
+                # Documents extracted by reindex_all but not yet in the index;
+                # see _apply_staged
+                c.execute("""
+                    CREATE TABLE IF NOT EXISTS staged_docs (
+                        path TEXT PRIMARY KEY,
+                        filename TEXT,
+                        mtime REAL,
+                        size INTEGER,
+                        fprint BLOB,
+                        content TEXT
                     )
                 """)
                 conn.commit()
         except Exception as e:
             print(f"Index DB Init Error: {e}")
 
-    def index_file(self, full_path: str, relative_path: str):
+    def optimize(self):
+        """Run PRAGMA optimize; called periodically by the server."""
+        try:
+            with self._connection() as conn:
+                conn.execute("PRAGMA optimize")
+        except Exception as e:
+            print(f"Index optimize error: {e}")
+
+    def _write_batch(self, c, batch: List["IndexedDoc"]):
+        """Issues a fixed number of statements regardless of batch size."""
+        if not batch:
+            return
+
+        paths = [doc.path for doc in batch]
+        # External-content FTS: stale entries are removed by replaying their
+        # original values through the 'delete' command before the text changes.
+        # Stay well below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds.
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            c.execute(f"""
+                INSERT INTO pdf_fts (pdf_fts, rowid, filename, content, path, mtime)
+                SELECT 'delete', id, filename, content, path, mtime
+                FROM content_raw WHERE path IN ({placeholders})
+            """, chunk)
+
+        raw_rows = [(doc.path, doc.filename, doc.mtime, doc.content) for doc in batch]
+        meta_rows = [(doc.path, doc.mtime, doc.size, doc.fprint) for doc in batch]
+        # Upsert keeps each document's id (the FTS rowid) stable
+        c.executemany("""
+            INSERT INTO content_raw (path, filename, mtime, content) VALUES (?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                filename = excluded.filename, mtime = excluded.mtime, content = excluded.content
+        """, raw_rows)
+        c.executemany("INSERT OR REPLACE INTO file_meta (path, mtime, size, fprint) VALUES (?, ?, ?, ?)", meta_rows)
+
+        c.executemany("""
+            INSERT INTO pdf_fts (rowid, filename, content, path, mtime)
+            SELECT id, filename, content, path, mtime FROM content_raw WHERE path = ?
+        """, [(path,) for path in paths])
+
+    def _stage_batch(self, c, batch: List["IndexedDoc"]):
+        """Park extracted documents in staged_docs until _apply_staged."""
+        c.executemany("""
+            INSERT OR REPLACE INTO staged_docs (path, filename, mtime, size, fprint, content)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(doc.path, doc.filename, doc.mtime, doc.size, doc.fprint, doc.content) for doc in batch])
+
+    def _apply_staged(self, c):
+        """
+        Move staged documents into content_raw/file_meta and rebuild pdf_fts,
+        all in the caller's transaction. An interrupted reindex therefore never
+        leaves pdf_fts out of step with content_raw, and the files it had not
+        applied still look changed to the next run.
+        """
+        c.execute("""
+            INSERT INTO content_raw (path, filename, mtime, content)
+            SELECT path, filename, mtime, content FROM staged_docs WHERE true
+            ON CONFLICT(path) DO UPDATE SET
+                filename = excluded.filename, mtime = excluded.mtime, content = excluded.content
+        """)
+        c.execute("""
+            INSERT OR REPLACE INTO file_meta (path, mtime, size, fprint)
+            SELECT path, mtime, size, fprint FROM staged_docs
+        """)
+        c.execute("DELETE FROM staged_docs")
+        self._rebuild_fts(c)
+
+    def _touch_batch(self, c, touched: List[Tuple[float, str]]):
+        """Record the new mtime of files whose content fingerprint did not change."""
+        c.executemany("UPDATE file_meta SET mtime = ? WHERE path = ?", touched)
+        # mtime is UNINDEXED, so changing it in the content table leaves pdf_fts consistent
+        c.executemany("UPDATE content_raw SET mtime = ? WHERE path = ?", touched)
+
+    def _rebuild_fts(self, c):
+        """Rebuild pdf_fts from content_raw in one shot instead of row by row."""
+        c.execute("INSERT INTO pdf_fts (pdf_fts) VALUES ('rebuild')")
+        c.execute("INSERT INTO pdf_fts (pdf_fts) VALUES ('optimize')")
+
+    def index_file(self, full_path: str, relative_path: str, conn: Optional[sqlite3.Connection] = None):
+        """
+        Index a single PDF. Pass conn to write through a caller-managed connection
+        (the caller is then responsible for committing).
+        """
         if not os.path.exists(full_path):
             return
 
         try:
-            current_mtime = os.stat(full_path).st_mtime
+            st = os.stat(full_path)
+            self._update_file_tree(relative_path, st.st_mtime, st.st_size)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with (nullcontext(conn) if conn is not None else self._connection()) as conn:
                 c = conn.cursor()
 
                 # Check if needs update
-                c.execute("SELECT mtime FROM file_meta WHERE path = ?", (relative_path,))
+                c.execute("SELECT mtime, size, fprint FROM file_meta WHERE path = ?", (relative_path,))
                 row = c.fetchone()
-                
-                if row and row[0] == current_mtime:
+
+                state, fprint = _classify(full_path, st.st_mtime, st.st_size, row)
+                if state == "unchanged":
+                    return
+                if state == "touched":
+                    self._touch_batch(c, [(st.st_mtime, relative_path)])
                     return
                 
-                # Parse PDF using pdfplumber
                 # Note: This part is CPU intensive and blocking, but we run it in thread threadpool in server.py
-                full_text = ""
                 try:
-                    with pdfplumber.open(full_path) as pdf:
-                        text_content = []
-                        for page in pdf.pages:
-                            extracted = page.extract_text()
-                            if extracted:
-                                text_content.append(extracted)
-                        full_text = "\n".join(text_content)
+                    full_text = _extract_text(full_path)
                 except Exception as e:
                     print(f"PDF content extraction failed for {full_path}: {e}")
                     return
 
                 filename = os.path.basename(full_path)
-
-                if row:
-                    # Update existing
-                    c.execute("DELETE FROM pdf_fts WHERE path = ?", (relative_path,))
-                
-                # Simple content cleaning for better searching
-                full_text = " ".join(full_text.split())
-
-                c.execute("INSERT INTO pdf_fts (filename, content, path, mtime) VALUES (?, ?, ?, ?)", 
-                          (filename, full_text, relative_path, current_mtime))
-                
-                c.execute("INSERT OR REPLACE INTO file_meta (path, mtime) VALUES (?, ?)", 
-                          (relative_path, current_mtime))
-                
-                conn.commit()
+                self._write_batch(c, [IndexedDoc(relative_path, filename, full_text, st.st_mtime,
+                                                 st.st_size, fprint)])
                 print(f"Indexed: {filename}")
+
+            self._invalidate_search_cache()
                 
         except Exception as e:
             print(f"Failed to index {full_path}: {e}")
 
     def search(self, query: str, scope: str = "all", fuzzy_threshold: float = 0.85) -> List[Dict]:
         """
-        Search for text content within PDFs.
-        fuzzy_threshold: 0.0-1.0, minimum similarity score for matches (default 85%)
+        Search for text content within PDFs. Exact matches are tried first; the
+        fuzzy pass only runs when they give fewer than SEARCH_MIN_HITS results.
+        fuzzy_threshold: 0.0-1.0, lower allows more edits per correction (1.0 disables fuzzy)
+
+        Results are cached (LRU, SEARCH_CACHE_TTL seconds) per index version,
+        so any write to the index invalidates them.
         """
-        import re
-        from rapidfuzz import process, fuzz
-        
-        # Scope mapping
-        scope_map = {
-            "import": "%/Import_Policy/%",
-            "export": "%/Export_Policy/%",
-            "import_extra": "%/Import_Policy_Extra/%",
-            "export_extra": "%/Export_Policy_Extra/%"
-        }
+        key = (query, scope, fuzzy_threshold, self._index_version)
+        now = time.monotonic()
+        with self._cache_lock:
+            hit = self._search_cache.get(key)
+            if hit and now - hit[0] < SEARCH_CACHE_TTL:
+                self._search_cache.move_to_end(key)
+                return hit[1]
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                c = conn.cursor()
-                
-                # For fuzzy matching, we do a broader search first
-                # Then filter results by similarity score
-                
-                # Create FTS5 query with wildcards for broader matching
-                search_terms = query.strip().split()
-                
-                # Enhanced Fuzzy Matching using Vocabulary
-                # 1. Fetch all terms from index to find corrections
-                c.execute("SELECT term FROM pdf_terms")
-                vocab_list = [r[0] for r in c.fetchall()]
-                
-                expanded_terms = []
-                effective_query_terms = set(search_terms)
-                
-                # Convert threshold to 0-100 scale for rapidfuzz
-                score_cutoff = fuzzy_threshold * 100
-                
-                for term in search_terms:
-                    # Always include the original term
-                    term_alternatives = [f'"{term}"*']
-                    
-                    # Only look for fuzzy matches if threshold allows it (strictly less than 1.0)
-                    if fuzzy_threshold < 1.0:
-                        # Find closest match in vocabulary
-                        match = process.extractOne(term, vocab_list, scorer=fuzz.ratio, score_cutoff=score_cutoff)
-                        if match:
-                            corrected_term, score, _ = match
-                            if corrected_term != term:
-                                term_alternatives.append(f'"{corrected_term}"*')
-                                effective_query_terms.add(corrected_term)
-                    
-                    expanded_terms.append(" OR ".join(term_alternatives))
-
-                # Combine all term groups with OR (matching original logic, though AND might be better for multi-word)
-                # Original was: " OR ".join([f'"{term}"*'...]) implies any word match is enough.
-                # Here we group corrections: (term OR correction) OR (term2 OR correction2)
-                # But to maintain original structure which flatly specificied ORs:
-                
-                fts_query = " OR ".join(expanded_terms)
-                
-                sql = """
-                    SELECT path, filename, content
-                    FROM pdf_fts 
-                    WHERE pdf_fts MATCH ?
-                """
-                params = [fts_query]
-
-                if scope in scope_map:
-                    sql += " AND path LIKE ?"
-                    params.append(scope_map[scope])
-                
-                sql += " LIMIT 200"  # Get more results for fuzzy filtering
-
-                c.execute(sql, tuple(params))
-                
-                results = []
-                query_lower = query.lower()
-                
-                for row in c.fetchall():
-                    path, filename, content = row
-                    content_lower = content.lower() if content else ""
-                    
-                    # Find best matching snippet
-                    best_score = 0
-                    best_snippet = ""
-                    
-                    # Search for query in content and score similarity
-                    words = content_lower.split()
-                    query_words = query_lower.split()
-                    
-                    # Slide a window over content to find best matching region
-                    window_size = max(20, len(query_words) * 3)
-                    
-                    for i in range(0, len(words) - len(query_words) + 1, 5):
-                        window = " ".join(words[i:i + window_size])
-                        
-                        # Calculate similarity
-                        # Calculate similarity using RapidFuzz which is faster
-                        # fuzz.ratio returns 0-100, so divide by 100.0
-                        score = fuzz.ratio(query_lower, window[:len(query_lower) * 2]) / 100.0
-                        
-                        # Also check if query terms appear in window
-                        term_matches = sum(1 for term in query_words if term in window) / len(query_words)
-                        combined_score = (score + term_matches) / 2
-                        
-                        if combined_score > best_score:
-                            best_score = combined_score
-                            # Get the actual snippet from original content
-                            original_words = content.split()
-                            start = max(0, i - 5)
-                            end = min(len(original_words), i + window_size + 5)
-                            snippet = " ".join(original_words[start:end])
-                            
-                            # Highlight query terms
-                            for term in effective_query_terms:
-                                snippet = re.sub(
-                                    f'({re.escape(term)})',
-                                    r'<b>\1</b>',
-                                    snippet,
-                                    flags=re.IGNORECASE
-                                )
-                            best_snippet = "..." + snippet + "..."
-                    
-                    # Apply fuzzy threshold filter
-                    if best_score >= fuzzy_threshold or any(term.lower() in content_lower for term in effective_query_terms):
-                        results.append({
-                            "path": path,
-                            "name": filename,
-                            "score": best_score,
-                            "matches": [{
-                                "snippet": best_snippet if best_snippet else f"Match found in {filename}"
-                            }]
-                        })
-                
-                # Sort by score descending
-                results.sort(key=lambda x: x.get("score", 0), reverse=True)
-                
-                return results[:50]  # Return top 50
-                
+            results = self._search(query, scope, fuzzy_threshold)
         except Exception as e:
             print(f"Search error: {e}")
             return []
 
+        with self._cache_lock:
+            self._search_cache[key] = (now, results)
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+        return results
+
+    def _get_vocab(self, c) -> List[str]:
+        """Term list from pdf_terms, loaded once per index version instead of per query."""
+        with self._cache_lock:
+            version, vocab = self._vocab
+            if version == self._index_version:
+                return vocab
+            version = self._index_version
+
+        c.execute("SELECT term FROM pdf_terms")
+        vocab = [r[0] for r in c.fetchall()]
+        with self._cache_lock:
+            self._vocab = (version, vocab)
+        return vocab
+
+    def _search(self, query: str, scope: str, fuzzy_threshold: float) -> List[Dict]:
+        # Exact prefix matches are a plain lookup in the FTS index; the fuzzy
+        # pass scans the whole vocabulary, so only pay for it on thin results.
+        results = self.search_exact(query, scope)
+        if len(results) >= SEARCH_MIN_HITS or fuzzy_threshold >= 1.0:
+            return results
+        return self.search_fuzzy(query, scope, fuzzy_threshold)
+
+    def search_exact(self, query: str, scope: str = "all") -> List[Dict]:
+        """Prefix match on the query terms as typed."""
+        terms = query.strip().split()
+        with self._connection() as conn:
+            return self._match(conn.cursor(), [f'"{term}"*' for term in terms], scope)
+
+    def search_fuzzy(self, query: str, scope: str = "all", fuzzy_threshold: float = 0.85) -> List[Dict]:
+        """
+        Like search_exact, but each term is OR'd with its closest vocabulary
+        term. A correction may be at most FUZZY_MAX_EDITS edits away, fewer for
+        short terms or a high fuzzy_threshold.
+        """
+        import numpy as np
+        from rapidfuzz import process
+        from rapidfuzz.distance import Levenshtein
+
+        search_terms = query.strip().split()
+        # The unicode61 tokenizer stores terms lowercased; compare in the same
+        # case so an edit is never spent on capitalisation
+        folded_terms = [term.lower() for term in search_terms]
+
+        with self._connection() as conn:
+            c = conn.cursor()
+
+            # Index terms used to find corrections (cached per index version)
+            vocab_list = self._get_vocab(c)
+
+            # One cdist call scores every query term against the vocabulary in C
+            # (across all cores). With score_cutoff the distance computation gives
+            # up after FUZZY_MAX_EDITS edits instead of scoring each pair fully.
+            corrections = [None] * len(search_terms)
+            if search_terms and vocab_list:
+                dists = process.cdist(folded_terms, vocab_list, scorer=Levenshtein.distance,
+                                      score_cutoff=FUZZY_MAX_EDITS, dtype=np.uint8, workers=-1)
+                best = dists.argmin(axis=1)
+                for i, (term, j) in enumerate(zip(folded_terms, best)):
+                    max_edits = min(FUZZY_MAX_EDITS, max(1, round(len(term) * (1 - fuzzy_threshold))))
+                    # Distance 0 means the term is already in the vocabulary
+                    if 0 < dists[i, j] <= max_edits:
+                        corrections[i] = vocab_list[j]
+
+            # Any term (or its correction) matching is enough
+            alternatives = []
+            for term, folded, corrected_term in zip(search_terms, folded_terms, corrections):
+                # Always include the original term
+                alternatives.append(f'"{term}"*')
+                if corrected_term and corrected_term != folded:
+                    alternatives.append(f'"{corrected_term}"*')
+
+            return self._match(c, alternatives, scope)
+
+    def _match(self, c, alternatives: List[str], scope: str) -> List[Dict]:
+        if not alternatives:
+            return []
+
+        # Snippets and ranking are computed by FTS5 in C; corrected terms are
+        # part of the MATCH expression so snippet() highlights them too.
+        sql = """
+            SELECT path, filename,
+                   snippet(pdf_fts, 1, '<b>', '</b>', '...', 20),
+                   rank
+            FROM pdf_fts 
+            WHERE pdf_fts MATCH ?
+        """
+        params = [" OR ".join(alternatives)]
+
+        if scope in SCOPE_PATTERNS:
+            sql += " AND path LIKE ?"
+            params.append(SCOPE_PATTERNS[scope])
+
+        # The rank column (bm25 by default) lets FTS5 sort the matches itself
+        sql += " ORDER BY rank LIMIT 50"
+
+        # Only snippet-sized strings cross into Python: content is never
+        # selected, and rows are consumed straight off the cursor.
+        results = []
+        for path, filename, snippet, rank in c.execute(sql, tuple(params)):
+            results.append({
+                "path": path,
+                "name": filename,
+                # rank is lower-is-better; flip it so higher scores rank first
+                "score": -rank,
+                "matches": [{
+                    "snippet": snippet if snippet else f"Match found in {filename}"
+                }]
+            })
+
+        return results
+
     def reindex_all(self, base_path: str):
+        """
+        Re-index every PDF under base_path whose content changed. Text extraction
+        runs in a process pool (PDF parsing is CPU bound and holds the GIL); the
+        results are written by this thread over a single connection. Returns
+        immediately if another reindex is already running.
+        """
+        if not self._reindex_lock.acquire(blocking=False):
+            print("Re-indexing already in progress; skipped.")
+            return
+        try:
+            self._reindex_all(base_path)
+        finally:
+            self._reindex_lock.release()
+
+    def _reindex_all(self, base_path: str):
         print("Starting full re-indexing...")
         count = 0
         try:
-            for root, dirs, files in os.walk(base_path):
-                for file in files:
-                    if file.endswith(".pdf"):
-                        full_path = os.path.join(root, file)
-                        rel_dir = os.path.relpath(root, base_path)
-                        
-                        if rel_dir == ".":
-                             web_path = f"/files/{file}"
+            stamp = _tree_stamp(base_path)
+            found = list(iter_pdfs(base_path))
+            # The walk doubles as a refresh of the /api/files listing
+            self._set_file_tree(build_file_tree(found), stamp)
+
+            pdfs = [(full_path, f"/files/{rel_path}", mtime, size)
+                    for full_path, rel_path, mtime, size in found]
+            count = len(pdfs)
+
+            with self._connection() as conn:
+                c = conn.cursor()
+
+                # One query for every known file instead of a lookup per file
+                known = {path: (mtime, size, fprint) for path, mtime, size, fprint
+                         in c.execute("SELECT path, mtime, size, fprint FROM file_meta")}
+
+                pending = []
+                touched = []
+                for full_path, web_path, mtime, size in pdfs:
+                    try:
+                        state, fprint = _classify(full_path, mtime, size, known.get(web_path))
+                    except OSError:
+                        continue
+                    if state == "touched":
+                        touched.append((mtime, web_path))
+                    elif state == "changed":
+                        pending.append((full_path, web_path, mtime, size, fprint))
+
+                # Left over from an interrupted run; those files were never
+                # applied, so they are in pending again
+                c.execute("DELETE FROM staged_docs")
+                if touched:
+                    self._touch_batch(c, touched)
+                conn.commit()
+
+                # A bulk load is staged and applied with a single FTS rebuild;
+                # a few changed files go straight in through the incremental
+                # path, so the write lock is never held for a whole-corpus pass.
+                bulk = not known or len(pending) >= FTS_REBUILD_FRACTION * len(known)
+                batch = []
+
+                def flush():
+                    # Take the write lock only while flushing so searches are
+                    # never blocked behind PDF parsing.
+                    if batch:
+                        c.execute("BEGIN IMMEDIATE")
+                        if bulk:
+                            self._stage_batch(c, batch)
                         else:
-                             web_path = f"/files/{rel_dir}/{file}"
-                        
-                        self.index_file(full_path, web_path)
-                        count += 1
+                            self._write_batch(c, batch)
+                        conn.commit()
+                        batch.clear()
+                        if not bulk:
+                            self._invalidate_search_cache()
+
+                if pending:
+                    workers = min(os.cpu_count() or 1, 8, len(pending))
+                    with ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT) as pool:
+                        futures = {pool.submit(_extract_text, item[0]): item for item in pending}
+                        for future in as_completed(futures):
+                            full_path, web_path, mtime, size, fprint = futures[future]
+                            try:
+                                full_text = future.result()
+                            except Exception as e:
+                                print(f"PDF content extraction failed for {full_path}: {e}")
+                                continue
+                            filename = os.path.basename(full_path)
+                            batch.append(IndexedDoc(web_path, filename, full_text, mtime, size, fprint))
+                            print(f"Indexed: {filename}")
+                            if len(batch) >= COMMIT_BATCH_SIZE:
+                                flush()
+                    flush()
+
+                    if bulk:
+                        c.execute("BEGIN IMMEDIATE")
+                        self._apply_staged(c)
+                        conn.commit()
+                        self._invalidate_search_cache()
+
+                        # Fresh statistics for the planner after a bulk load
+                        c.execute("ANALYZE")
+                        c.execute("PRAGMA optimize")
         except Exception as e:
              print(f"Re-indexing error: {e}")
         
@@ -1,36 +1,154 @@
 import asyncio
 import os
-import sys
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Set
 from contextlib import asynccontextmanager
+from pathlib import Path
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from extract_dgft_pdfs import RunOptions, main as extract_main
 
 from .indexer import SearchIndexer
 
 # Initialize Indexer
 indexer = SearchIndexer()
 
+class PdfEventHandler(FileSystemEventHandler):
+    """Forwards created/modified/moved PDF paths from the watchdog thread to an asyncio queue."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+
+    def _push(self, path: str):
+        if path.endswith(".pdf"):
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._push(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._push(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._push(event.dest_path)
+
+class IndexWatcher:
+    """
+    Incrementally indexes PDFs as they appear under base_path while the
+    server runs; the reindex_all walk at startup (or via /api/reindex)
+    catches up on anything that changed while it was down.
+    """
+    # Quiet period used to coalesce the burst of events a single download produces
+    DEBOUNCE_SECONDS = 1.0
+    # A steady stream of downloads never goes quiet; flush a batch this old or
+    # this large anyway
+    MAX_BATCH_SECONDS = 5.0
+    MAX_BATCH_PATHS = 50
+
+    def __init__(self, indexer: SearchIndexer, base_path: str):
+        self.indexer = indexer
+        self.base_path = base_path
+        self.observer: Optional[Observer] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        queue: asyncio.Queue = asyncio.Queue()
+        os.makedirs(self.base_path, exist_ok=True)
+        self.observer = Observer()
+        self.observer.schedule(PdfEventHandler(asyncio.get_running_loop(), queue), self.base_path, recursive=True)
+        self.observer.start()
+        self.task = asyncio.create_task(self._consume(queue))
+
+    async def stop(self):
+        if self.observer:
+            self.observer.stop()
+            await asyncio.to_thread(self.observer.join)
+        if self.task:
+            self.task.cancel()
+
+    async def _consume(self, queue: asyncio.Queue):
+        while True:
+            paths = {await queue.get()}
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.MAX_BATCH_SECONDS
+            # Keep collecting until the tree has been quiet for a moment
+            while len(paths) < self.MAX_BATCH_PATHS:
+                timeout = min(self.DEBOUNCE_SECONDS, deadline - loop.time())
+                if timeout <= 0:
+                    break
+                try:
+                    paths.add(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            for full_path in paths:
+                rel_path = os.path.relpath(full_path, self.base_path).replace(os.sep, "/")
+                try:
+                    await asyncio.to_thread(self.indexer.index_file, full_path, f"/files/{rel_path}")
+                except Exception as e:
+                    print(f"Incremental indexing failed for {full_path}: {e}")
+
+index_watcher = IndexWatcher(indexer, "downloads")
+
+def configure_thread_pool():
+    # asyncio's default executor is min(32, cpu+4) threads; every search, file
+    # listing and incremental index call goes through it, so size it explicitly.
+    # Each worker thread keeps its own SQLite connection (see SearchIndexer._conn).
+    max_workers = int(os.getenv("THREAD_POOL_SIZE", "32"))
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_workers))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    configure_thread_pool()
+    try:
+        app.state.index_html = Path("dashboard/index.html").read_bytes()
+    except FileNotFoundError:
+        app.state.index_html = None
+    index_watcher.start()
+    # The watcher only sees changes from now on; catch up on PDFs downloaded
+    # while the server was down. Unchanged files cost one stat each.
     print("Background indexing started...")
     asyncio.create_task(run_indexing())
+    optimize_task = asyncio.create_task(periodic_optimize())
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    optimize_task.cancel()
+    await index_watcher.stop()
+    indexer.close()
 
 app = FastAPI(lifespan=lifespan)
 
+# The dashboard is served from this app, so CORS is only needed when the UI is
+# hosted elsewhere (e.g. a dev server); list those origins in DASHBOARD_ORIGINS.
+DASHBOARD_ORIGINS = [o.strip() for o in os.getenv("DASHBOARD_ORIGINS", "").split(",") if o.strip()]
+if DASHBOARD_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=DASHBOARD_ORIGINS,
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+# Compresses JSON like /api/files; PDFs are already compressed internally and
+# the log stream must not be buffered, so both are passed through.
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    GZipMiddleware,
+    minimum_size=1024,
+    exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/pdf", "text/event-stream"),
 )
 
 # Securely mount only the static assets directory, not the whole dashboard folder
@@ -61,6 +179,12 @@ async def run_indexing():
     except Exception as e:
         print(f"Indexing failed: {e}")
 
+async def periodic_optimize(interval: float = 900):
+    # Keep planner statistics current between full re-indexes
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(indexer.optimize)
+
 @app.post("/api/reindex")
 async def trigger_reindex():
     asyncio.create_task(run_indexing())
@@ -77,51 +201,62 @@ async def search_content(config: SearchConfig):
     # Offload blocking SQLite call to thread
     return await asyncio.to_thread(indexer.search, query, config.scope, fuzzy_threshold)
 
-class ConnectionManager:
+# Per-client buffer for the log stream; a client that falls this far behind
+# loses its oldest lines instead of holding up the others.
+LOG_CLIENT_QUEUE_SIZE = 1024
+# Comment line sent on idle streams so dead clients are noticed
+LOG_KEEPALIVE_SECONDS = 15
+
+def put_drop_oldest(queue: asyncio.Queue, item):
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        queue.get_nowait()
+        queue.put_nowait(item)
+
+class LogBroker:
+    """Fans log messages out to every connected /logs/stream client."""
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.subscribers: Set[asyncio.Queue] = set()
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_CLIENT_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
 
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                # Connection likely closed
-                pass
+    def publish(self, message: str):
+        for queue in self.subscribers:
+            put_drop_oldest(queue, message)
 
-manager = ConnectionManager()
+log_broker = LogBroker()
 
-# Job Manager to handle process state
+# Job Manager to handle extractor state
 class JobManager:
+    # How long /stop waits for the browser to shut down after cancelling
+    STOP_TIMEOUT = 10.0
+
     def __init__(self):
-        self.process: Optional[asyncio.subprocess.Process] = None
+        self.task: Optional[asyncio.Task] = None
         self.lock = asyncio.Lock()
 
-    async def start_job(self, cmd: List[str]):
+    async def start_job(self, options: RunOptions, on_log: Callable[[str], None]) -> asyncio.Task:
         async with self.lock:
-            if self.process and self.process.returncode is None:
+            if self.task and not self.task.done():
                 raise Exception("A job is already running.")
-            
-            self.process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT, 
-                cwd=os.getcwd() 
-            )
-            return self.process
+
+            # Runs in this event loop; no interpreter start-up or stdout pipe
+            self.task = asyncio.create_task(extract_main(options, on_log=on_log))
+            return self.task
 
     async def stop_job(self):
         async with self.lock:
-            if self.process and self.process.returncode is None:
-                self.process.terminate()
+            if self.task and not self.task.done():
+                self.task.cancel()
+                # Let the extractor's cleanup (browser.close) run before replying
+                await asyncio.wait({self.task}, timeout=self.STOP_TIMEOUT)
                 return True
             return False
 
@@ -129,12 +264,10 @@ job_manager = JobManager()
 
 @app.get("/")
 async def get():
-    # Serve index.html directly from root
-    try:
-        with open("dashboard/index.html", "r") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
+    # Serve index.html directly from root (read once at startup)
+    if app.state.index_html is None:
         return HTMLResponse(content="<h1>Error: dashboard/index.html not found</h1>", status_code=404)
+    return HTMLResponse(content=app.state.index_html)
 
 @app.get("/api/files")
 async def list_files():
@@ -142,110 +275,120 @@ async def list_files():
     Returns a tree or flat list of files in the downloads folder.
     """
     base_path = "downloads"
-    result = {}
-    
-    if not os.path.exists(base_path):
-        return {}
 
     try:
-        for folder in os.listdir(base_path):
-            folder_path = os.path.join(base_path, folder)
-            if os.path.isdir(folder_path):
-                files = []
-                for f in os.listdir(folder_path):
-                    if f.endswith(".pdf"):
-                        full_path = os.path.join(folder_path, f)
-                        try:
-                            stat = os.stat(full_path)
-                            files.append({
-                                "name": f,
-                                "path": f"/files/{folder}/{f}",
-                                "size": stat.st_size,
-                                "modified": stat.st_mtime
-                            })
-                        except OSError:
-                            continue
-                files.sort(key=lambda x: x['name'])
-                result[folder] = files
+        # Served from the indexer's cache unless a folder's mtime moved. Even the
+        # stat checks are blocking I/O, so keep them off the event loop.
+        return await asyncio.to_thread(indexer.get_file_tree, base_path)
     except Exception as e:
         print(f"Error listing files: {e}")
         return {}
-            
-    return result
 
-@app.websocket("/ws/logs")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
-    try:
-        while True:
-            # Keep connection alive
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
-    except Exception:
-        manager.disconnect(websocket)
-
-async def stream_output(process):
-    # Helper to stream stdout/stderr to websockets
-    if process.stdout:
-        async for line in process.stdout:
-            line_str = line.decode().strip()
-            if line_str:
-                await manager.broadcast(line_str)
+@app.get("/logs/stream")
+async def stream_logs():
+    """Server-sent events stream of job output."""
+    queue = log_broker.subscribe()
+
+    async def event_source():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), LOG_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                # Multi-line messages become one event with several data: fields
+                yield "".join(f"data: {line}\n" for line in message.split("\n")) + "\n"
+        finally:
+            log_broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Log lines arriving within this window are sent as one event
+LOG_FLUSH_INTERVAL = 0.05
+# Lines buffered between the extractor and the log writer; when full the
+# oldest line is dropped rather than slowing the job down.
+LOG_QUEUE_SIZE = 1024
+LOG_BATCH_SIZE = 256
+
+async def write_output(queue: asyncio.Queue):
+    # Broadcast queued lines in batches of up to LOG_BATCH_SIZE
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        await asyncio.sleep(LOG_FLUSH_INTERVAL)  # let a burst accumulate
+
+        raw = [item]
+        eof = False
+        while len(raw) < LOG_BATCH_SIZE:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is None:
+                eof = True
+                break
+            raw.append(item)
+
+        lines = [line_str for line_str in (line.strip() for line in raw) if line_str]
+        if lines:
+            log_broker.publish("\n".join(lines))
+        if eof:
+            return
     
 @app.post("/run")
 async def run_script(config: RunConfig):
-    # Build command
-    cmd = [sys.executable, "extract_dgft_pdfs.py"]
-    
-    if config.force:
-        cmd.append("--force")
-    
-    if config.chapter:
-        cmd.extend(["--chapter", config.chapter])
-        
-    if config.section:
-        cmd.extend(["--section", config.section])
-        
-    if config.skip_extras:
-        cmd.append("--skip-extras")
-        
-    if config.only_extras:
-        cmd.append("--only-extras")
-
     # Handle action (policy argument)
     # Prefer explicit policy if set, otherwise derive from action
     effective_policy = config.policy if config.policy else config.action
-    if effective_policy == "import":
-        cmd.extend(["--policy", "import"])
-    elif effective_policy == "export":
-        cmd.extend(["--policy", "export"])
-    else:
-        cmd.extend(["--policy", "all"])
+    if effective_policy not in ("import", "export"):
+        effective_policy = "all"
+
+    options = RunOptions(
+        force=config.force,
+        chapter=config.chapter or None,
+        policy=effective_policy,
+        skip_extras=config.skip_extras,
+        only_extras=config.only_extras,
+        section=config.section or None,
+    )
 
-    await manager.broadcast(f"> Starting command: {' '.join(cmd)}")
+    log_broker.publish(f"> Starting job: {options}")
 
     try:
-        # Start subprocess via manager
-        process = await job_manager.start_job(cmd)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+        task = await job_manager.start_job(options, on_log=lambda line: put_drop_oldest(queue, line))
 
         # Start streaming in bg task
-        asyncio.create_task(monitor_process(process))
+        asyncio.create_task(monitor_job(task, queue))
         
         return {"status": "success", "message": "Job started"}
     except Exception as e:
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
-async def monitor_process(process):
-    await stream_output(process)
-    await process.wait()
-    await manager.broadcast(f"> Process finished with exit code {process.returncode}")
+async def monitor_job(task: asyncio.Task, queue: asyncio.Queue):
+    writer = asyncio.create_task(write_output(queue))
+    await asyncio.wait({task})
+    put_drop_oldest(queue, None)  # EOF
+    await writer
+
+    if task.cancelled():
+        log_broker.publish("> Process finished (cancelled).")
+    elif task.exception() is not None:
+        log_broker.publish(f"> Process finished with error: {task.exception()!r}")
+    else:
+        log_broker.publish("> Process finished.")
 
 @app.post("/stop")
 async def stop_script():
     stopped = await job_manager.stop_job()
     if stopped:
-        await manager.broadcast("> Process terminated by user.")
+        log_broker.publish("> Process terminated by user.")
         return {"status": "success", "message": "Process terminating..."}
     return {"status": "error", "message": "No process running"}
 
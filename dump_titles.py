@@ -6,8 +6,8 @@ async def main():
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         page = await browser.new_page()
-        await page.goto("https://www.dgft.gov.in/CP/?opt=itchs-import-export")
-        await page.wait_for_load_state("networkidle")
+        await page.goto("https://www.dgft.gov.in/CP/?opt=itchs-import-export", wait_until="domcontentloaded")
+        await page.wait_for_selector("h5")
         
         # Get all h5 titles
         titles = await page.evaluate("""() => {
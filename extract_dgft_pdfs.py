@@ -1,28 +1,82 @@
 import asyncio
 import os
 import re
-import base64
+import time
+import binascii
+import functools
+import orjson
+import aiofiles
+import aiohttp
 from playwright.async_api import async_playwright
 import argparse
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Callable, Dict, Optional, List
 
 # ============ CONFIGURATION ============
 @dataclass
 class Config:
     BASE_URL: str = "https://www.dgft.gov.in/CP/?opt=itchs-import-export"
     DOWNLOAD_DIR: str = "downloads"
+    PROFILE_DIR: str = ".pw-cache"  # Chromium profile kept between runs (cookies, storage)
     MAX_FILENAME_LENGTH: int = 240
+    # Upper bounds only; every wait returns as soon as its DOM signal shows up
     TIMEOUTS = {
         "page_load": 10000,
-        "row_render": 2000,
-        "post_click": 3000,
-        "poll_interval": 200,
+        "row_render": 5000,
+        "blob_capture": 4000,
+        "blob_grace": 500,  # after a response hit, for the same click's window.open to arrive
+        "download": 30000,
+        "click": 5000,
     }
-    BLOB_POLL_ATTEMPTS: int = 20
+    MAX_PARALLEL_CARDS: int = 8  # Worker pages scraping cards at once (one shared browser context)
+    REQUESTS_PER_SECOND: float = 3  # Politeness cap on navigations/clicks/fetches across all cards
+    MAX_PARALLEL_DOWNLOADS: int = 16  # Direct-link PDF fetches in flight at once, across all cards
+    DOWNLOAD_RETRIES: int = 3  # Attempts per direct-link PDF on 5xx or connection errors
+    MANIFEST_TTL: int = 24 * 3600  # Seconds a completed card is trusted before it is re-scraped
+    # Never fetched by the scraper. Stylesheets stay: without them the icon-only
+    # PDF links have no size, and Playwright refuses to click invisible elements.
+    BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+    BROWSER_ARGS = ("--disable-dev-shm-usage", "--disable-gpu")
 
 CONFIG = Config()
 
+@dataclass
+class RunOptions:
+    """Per-run options; mirrors the command line flags."""
+    force: bool = False
+    chapter: Optional[str] = None
+    policy: str = "all"
+    skip_extras: bool = False
+    only_extras: bool = False
+    section: Optional[str] = None
+
+# Where log() output goes for the current run (stdout unless main() got on_log)
+_log_sink: ContextVar[Callable[[str], None]] = ContextVar("log_sink", default=print)
+
+def log(message: str = "") -> None:
+    _log_sink.get()(message)
+
+# HTTP session for direct-link PDFs, opened by main() for the run
+_http_session: ContextVar[Optional[aiohttp.ClientSession]] = ContextVar("http_session", default=None)
+
+class RateLimiter:
+    """Spaces acquire() calls at least 1/rate seconds apart, shared by all cards."""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        # Reserve a slot without awaiting first, so concurrent callers queue up in order
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+rate_limiter = RateLimiter(CONFIG.REQUESTS_PER_SECOND)
+download_slots = asyncio.Semaphore(CONFIG.MAX_PARALLEL_DOWNLOADS)
+
 # Extra/Auxiliary items to download
 IMPORT_EXTRA_ITEMS = [
     "Notification",
@@ -54,70 +108,391 @@ EXPORT_EXTRA_ITEMS = [
 ]
 
 # ============ HELPER FUNCTIONS ============
+_UNSAFE_CHARS_RE = re.compile(r'[^\w\s-]')
+_SEPARATOR_RUN_RE = re.compile(r'[\s_]+')
+# Deletes the ASCII characters _UNSAFE_CHARS_RE would remove
+_ASCII_UNSAFE = str.maketrans("", "", "".join(
+    c for c in map(chr, range(128)) if not (c.isalnum() or c.isspace() or c in "_-")
+))
+
+# Cached: row columns repeat a lot (card titles, shared description text), and
+# a page-1 skip check followed by the save names the same row twice.
+@functools.lru_cache(maxsize=4096)
 def sanitize_filename(text: str, max_length: int = 80) -> str:
     """Sanitize text for use in filename."""
     if not text: return "unnamed"
-    safe = re.sub(r'[^\w\s-]', '', text)
-    safe = re.sub(r'[\s_]+', '_', safe)  # Collapse multiple spaces/underscores
-    safe = safe.strip('_')
+    if text.isascii():
+        # Fast path, same result as the regexes: split() collapses and trims separator runs
+        safe = "_".join(text.translate(_ASCII_UNSAFE).replace('_', ' ').split())
+    else:
+        safe = _UNSAFE_CHARS_RE.sub('', text)
+        safe = _SEPARATOR_RUN_RE.sub('_', safe)  # Collapse multiple spaces/underscores
+        safe = safe.strip('_')
     return safe[:max_length] if safe else "unnamed"
 
-async def download_pdf_from_url(page_or_context, url: str, filepath: str) -> bool:
-    """Download PDF from URL (handles both regular and blob URLs)."""
+# Reads a blob: URL from inside the page that created it and returns the
+# bare base64 payload (the data URL header is dropped on the JS side).
+BLOB_FETCH_JS = """
+async (url) => {
+    const response = await fetch(url);
+    const blob = await response.blob();
+    const reader = new FileReader();
+    return new Promise((resolve, reject) => {
+        reader.onerror = reject;
+        reader.onloadend = () => {
+            const result = reader.result;
+            const comma = result.indexOf(',');
+            if (comma < 0) reject(new Error('Invalid data URL format'));
+            else resolve(result.slice(comma + 1));
+        };
+        reader.readAsDataURL(blob);
+    });
+}
+"""
+
+async def write_pdf(filepath: str, data: bytes):
+    # Readers accept the header anywhere in the first 1KB; anything without it
+    # is an HTML or error page, which must not be saved (and recorded) as done.
+    if b"%PDF-" not in data[:1024]:
+        raise ValueError("content is not a PDF")
+    # Write under a temporary name so an interrupted save never leaves a
+    # truncated .pdf that later runs (and the indexer) would trust.
+    partial = filepath + ".part"
+    async with aiofiles.open(partial, "wb") as f:
+        await f.write(data)
+    os.replace(partial, filepath)
+
+async def fetch_pdf(page, url: str) -> bytes:
+    """
+    GET a plain http(s) PDF outside the browser, sending the page's cookies.
+    5xx responses and connection errors are retried with exponential backoff.
+    """
+    session = _http_session.get()
+    if session is None:
+        raise RuntimeError("no HTTP session for this context (main() opens it)")
+    # Read per fetch: the site may set or refresh session cookies while browsing
+    cookies = {c["name"]: c["value"] for c in await page.context.cookies(url)}
+    error = None
+    for attempt in range(CONFIG.DOWNLOAD_RETRIES):
+        if attempt:
+            await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+        await rate_limiter.acquire()
+        try:
+            async with session.get(url, cookies=cookies, headers={"Referer": page.url}) as response:
+                if response.status < 500:
+                    response.raise_for_status()
+                    return await response.read()
+                error = f"HTTP {response.status}"
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+    raise ValueError(f"{error} after {CONFIG.DOWNLOAD_RETRIES} attempts")
+
+async def download_pdf_from_url(page, url: str, filepath: str) -> bool:
+    """
+    Download PDF from URL (handles both regular and blob URLs). This is the one
+    save path for direct-PDF pages, new tabs and table rows alike.
+    """
     try:
         if not url:
             return False
-            
-        data_url = await page_or_context.evaluate("""
-            async (url) => {
-                const response = await fetch(url);
-                const blob = await response.blob();
-                const reader = new FileReader();
-                return new Promise((resolve, reject) => {
-                    reader.onerror = reject;
-                    reader.onloadend = () => resolve(reader.result);
-                    reader.readAsDataURL(blob);
-                });
-            }
-        """, url)
-        
-        if "," not in data_url:
-            raise ValueError("Invalid data URL format")
-            
-        _, encoded = data_url.split(",", 1)
-        data = base64.b64decode(encoded)
-        
-        with open(filepath, "wb") as f:
-            f.write(data)
+
+        if url.startswith("blob:"):
+            # Blob URLs only resolve inside the page that created them
+            # base64 is the cheapest encoding the evaluate bridge carries (a JSON
+            # array of byte values would be ~3x larger); decode it in one step.
+            data = binascii.a2b_base64(await page.evaluate(BLOB_FETCH_JS, url))
+        else:
+            # Everything else skips the browser: no base64 bridge and no
+            # driver round-trip for the bytes.
+            data = await fetch_pdf(page, url)
+        await write_pdf(filepath, data)
         return True
     except Exception as e:
-        print(f"Failed to download PDF from {url}: {e}")
+        log(f"Failed to download PDF from {url}: {e}")
         return False
 
-async def cleanup_extra_pages(context, main_page):
-    """Close all pages except the main one."""
-    for pg in context.pages:
-        if pg != main_page:
+# Reports every window.open URL to Python through the _notifyBlob binding.
+# Installed as an init script, so it runs once per document before the site's
+# own scripts (a page restored from bfcache keeps its wrapped window.open).
+BLOB_HOOK_JS = """
+(() => {
+    const originalOpen = window.open;
+    window.open = (url, target, features) => {
+        window._notifyBlob(String(url));
+        return originalOpen(url, target, features);
+    };
+})();
+"""
+
+# Reads every row of the current table page in one round-trip. Each row reports
+# a selector (relative to the row) for the PDF link it found, so the link can be
+# located again after the table body is redrawn; links with a real http(s) href
+# also report it so they can be fetched unclicked.
+# With a target chapter only its row is read; count is the unfiltered row count.
+ROW_SNAPSHOT_JS = """
+(trs, [linkSelector, target]) => {
+    const rows = trs.filter(tr => tr.cells.length >= 2);
+    const wanted = target ? rows.filter(tr => tr.cells[0].innerText.trim() === target) : rows;
+    return {count: rows.length, rows: wanted.map(tr => {
+        let link, linkSel = linkSelector;
+        if (linkSelector) {
+            link = tr.querySelector(linkSelector);
+        } else if ((link = tr.querySelector('a i.fa-file-pdf'))) {
+            linkSel = 'a:has(i.fa-file-pdf)';
+        } else {
+            link = tr.cells[tr.cells.length - 1].querySelector('a');
+            linkSel = ':scope > :last-child a';
+        }
+        if (link && link.tagName === 'I') link = link.closest('a');
+        // link.href is resolved, so "#" or "" would look like the dashboard's own URL
+        const raw = link ? (link.getAttribute('href') || '').trim() : '';
+        const direct = raw && !raw.startsWith('#') && /^https?:/i.test(link.href)
+            && link.href.split('#')[0] !== location.href.split('#')[0];
+        return {
+            col0: tr.cells[0].innerText.trim(),
+            col1: tr.cells[1].innerText.trim(),
+            link: link ? linkSel : null,
+            href: direct ? link.href : null,
+        };
+    })};
+}
+"""
+
+# Switches the DataTable to a single page holding every row, so a card is one
+# snapshot instead of a click-and-redraw per page. Resolves false (and leaves
+# the table alone) when it is not a DataTable or already fits on one page.
+SHOW_ALL_ROWS_JS = """
+() => new Promise(resolve => {
+    const $ = window.jQuery;
+    if (!$ || !$.fn.dataTable || !$.fn.dataTable.isDataTable('#itcdetails')) return resolve(false);
+    const table = $('#itcdetails').DataTable();
+    if (table.page.info().pages <= 1) return resolve(false);
+    table.one('draw', () => resolve(true));
+    table.page.len(-1).draw();
+})
+"""
+
+# Per-folder record of completed cards and the files they saved:
+# {"cards": {title: {"completed_at": ts}}, "files": {filename: {"card", "col0", "col1", "mtime"}}}
+# Extras folders also keep "discovered": the card titles last read from the dashboard.
+MANIFEST_NAME = ".manifest.json"
+
+def load_manifest(folder_path: str) -> dict:
+    try:
+        with open(os.path.join(folder_path, MANIFEST_NAME), "rb") as f:
+            manifest = orjson.loads(f.read())
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault("cards", {})
+    manifest.setdefault("files", {})
+    return manifest
+
+def card_is_fresh(manifest: dict, card_title: str) -> bool:
+    entry = manifest["cards"].get(card_title)
+    return bool(entry) and time.time() - entry.get("completed_at", 0) < CONFIG.MANIFEST_TTL
+
+def _write_manifest(folder_path: str, update: Callable[[dict], None]):
+    os.makedirs(folder_path, exist_ok=True)
+    manifest = load_manifest(folder_path)
+    update(manifest)
+    path = os.path.join(folder_path, MANIFEST_NAME)
+    with open(path + ".tmp", "wb") as f:
+        f.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    os.replace(path + ".tmp", path)
+
+_manifest_locks: Dict[str, asyncio.Lock] = {}
+
+async def update_manifest(folder_path: str, update: Callable[[dict], None]):
+    """Apply update to folder_path's manifest and write it back."""
+    # The JSON rewrite runs off the event loop; the per-folder lock keeps cards
+    # sharing a folder from clobbering each other's entries.
+    lock = _manifest_locks.setdefault(folder_path, asyncio.Lock())
+    async with lock:
+        try:
+            await asyncio.to_thread(_write_manifest, folder_path, update)
+        except OSError as e:
+            log(f"Could not write manifest for {folder_path}: {e}")
+
+async def record_card(folder_path: str, card_title: str, files: Dict[str, dict], complete: bool = True):
+    """
+    Record the files a full pass over card_title saved, and mark the card
+    complete. With complete=False (some rows failed) any earlier completion is
+    dropped instead, so the next run neither skips the card nor stops after
+    its first page.
+    """
+    def update(manifest):
+        if complete:
+            manifest["cards"][card_title] = {"completed_at": time.time()}
+        else:
+            manifest["cards"].pop(card_title, None)
+        manifest["files"].update(files)
+    await update_manifest(folder_path, update)
+
+# Only URLs that look like assets are routed at all: every routed request is
+# paused until Python answers, so documents, scripts and XHR skip the handler.
+_ASSET_URL_RE = re.compile(r"\.(?:png|jpe?g|gif|svg|webp|ico|bmp|woff2?|ttf|otf|eot|mp4|webm|mp3)(?:[?#]|$)", re.IGNORECASE)
+
+async def _block_assets(route, request):
+    if request.resource_type in CONFIG.BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+def _exact_text_re(text: str) -> re.Pattern:
+    """Matches an element whose whole text is `text`, give or take whitespace."""
+    return re.compile(r"^\s*" + r"\s+".join(map(re.escape, text.split())) + r"\s*$")
+
+def _is_pdf_url(url: str) -> bool:
+    # Any ".pdf" suffix also contains "pdf", so one substring test covers both
+    url = url.lower()
+    return "pdf" in url or "/website/" in url
+
+class PopupHandler:
+    """
+    Handles every tab a worker page opens: a PDF tab is saved to `target`
+    (when set), then the tab is closed. Bound to the opener page rather than
+    the context, so workers sharing a context only see their own popups.
+
+    Also receives the blob: URLs the table passes to window.open, pushed from
+    the page through an exposed binding (see BLOB_HOOK_JS), and the PDF
+    responses the page itself fetches to build those blobs.
+    """
+    def __init__(self, page):
+        self.page = page
+        self.tasks = set()
+        self.blob_url: Optional[asyncio.Future] = None
+        self.pdf_response: Optional[asyncio.Future] = None
+        self.begin(None)
+        page.on("popup", self._on_page)
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if self.pdf_response and not self.pdf_response.done():
+            if "application/pdf" in response.headers.get("content-type", ""):
+                self.pdf_response.set_result(response)
+
+    def expect_pdf_response(self) -> asyncio.Future:
+        """Future for the next application/pdf response on the page; create it before the click."""
+        self.pdf_response = asyncio.get_running_loop().create_future()
+        return self.pdf_response
+
+    async def watch_blobs(self):
+        # Bindings and init scripts survive navigations, so this is done once
+        # per page; the hook is in place before any of the site's scripts run.
+        await self.page.expose_binding("_notifyBlob", self._on_blob)
+        await self.page.add_init_script(BLOB_HOOK_JS)
+
+    def _on_blob(self, source, url):
+        if url and url.startswith("blob:") and self.blob_url and not self.blob_url.done():
+            self.blob_url.set_result(url)
+
+    def expect_blob(self) -> asyncio.Future:
+        """Future for the next blob: URL opened; create it before the click."""
+        self.blob_url = asyncio.get_running_loop().create_future()
+        return self.blob_url
+
+    def begin(self, target: Optional[str]):
+        """Start tracking a new card's tabs."""
+        self.target = target
+        self.pdf_seen = 0
+        self.saved: List[str] = []
+
+    def _on_page(self, popup):
+        task = asyncio.create_task(self._handle(popup))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _handle(self, popup):
+        try:
+            try:
+                await popup.wait_for_load_state("domcontentloaded", timeout=CONFIG.TIMEOUTS["page_load"])
+            except Exception:
+                pass
+
+            if _is_pdf_url(popup.url):
+                self.pdf_seen += 1
+                target, self.target = self.target, None
+                if target:
+                    log(f"Downloading new tab {popup.url} to {os.path.basename(target)}...")
+                    if await download_pdf_from_url(popup, popup.url, target):
+                        self.saved.append(target)
+        finally:
             try:
-                await pg.close()
+                await popup.close()
             except Exception as e:
-                print(f"Error closing page: {e}")
+                log(f"Error closing page: {e}")
+
+    async def settle(self):
+        """Wait for tabs that are still loading or being saved."""
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+async def open_dashboard(page):
+    """Bring page to the BASE_URL card list, going back in history when that gets there."""
+    on_dashboard = page.url == CONFIG.BASE_URL
+    if on_dashboard and await page.query_selector("#itcdetails") is None:
+        return  # The previous card never left the card list
+    if page.url != "about:blank" and not on_dashboard:
+        try:
+            # Returning keeps the warm connection and, via bfcache, the parsed page
+            await rate_limiter.acquire()
+            await page.go_back(wait_until="domcontentloaded", timeout=CONFIG.TIMEOUTS["page_load"])
+            if page.url == CONFIG.BASE_URL and await page.query_selector("#itcdetails") is None:
+                await page.wait_for_selector("h5", timeout=CONFIG.TIMEOUTS["page_load"])
+                return
+        except Exception:
+            pass
 
-async def process_card(page, context, card_title, output_folder, force_update=False, target_chapter=None, link_selector=None, container_selector=None):
+    log(f"Navigating to {CONFIG.BASE_URL}...")
+    await rate_limiter.acquire()
+    # networkidle waits out the site's analytics traffic; the page is usable
+    # as soon as the card titles have rendered.
+    await page.goto(CONFIG.BASE_URL, wait_until="domcontentloaded")
+    await page.wait_for_selector("h5", timeout=CONFIG.TIMEOUTS["page_load"])
+
+async def record_discovered(folder_path: str, titles: List[str]):
+    """Remember the card titles the dashboard listed for this folder."""
+    def update(manifest):
+        manifest["discovered"] = titles
+    await update_manifest(folder_path, update)
+
+# Titles of the clickable cards in a schedule's container, in page order
+CARD_TITLES_JS = """
+hs => [...new Set(hs.filter(h => h.closest('a')).map(h => h.innerText.trim()).filter(Boolean))]
+"""
+
+async def discover_cards(page, container_selector: str, main_title: str) -> List[str]:
+    """Card titles listed under container_selector, other than the schedule's main card."""
+    titles = await page.eval_on_selector_all(f"xpath={container_selector}//h5", CARD_TITLES_JS)
+    return [t for t in titles if t != main_title]
+
+async def process_card(page, popups: PopupHandler, card_title, output_folder, force_update=False, target_chapter=None, link_selector=None, container_selector=None):
     """
     Process a specific card (Policy section, Appendix, etc.) from the dashboard.
     """
-    print(f"\n--- Starting {card_title} ({output_folder}) ---")
+    log(f"\n--- Starting {card_title} ({output_folder}) ---")
     folder_path = os.path.join(CONFIG.DOWNLOAD_DIR, output_folder)
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path, exist_ok=True)
+    os.makedirs(folder_path, exist_ok=True)
+    # One listdir instead of a stat per row
+    existing = {f for f in os.listdir(folder_path) if f.endswith(".pdf")}
+    manifest = await asyncio.to_thread(load_manifest, folder_path)
+    seen_before = card_title in manifest["cards"]
+    # (card, col0, col1) -> filename it was saved under, so a row stays cached
+    # even if the filename rules change between runs
+    scraped = {(f.get("card"), f.get("col0"), f.get("col1")): name for name, f in manifest["files"].items()}
+    # Only a full pass over the card is recorded (--force passes included),
+    # and it counts as complete only if nothing failed
+    record = not target_chapter
+    failed = False
+
+    # A card that opens its PDF in a new tab is saved by the popup handler
+    card_pdf = sanitize_filename(card_title) + ".pdf"
+    popups.begin(None if card_pdf in existing and not force_update else os.path.join(folder_path, card_pdf))
 
-    print(f"Navigating to {CONFIG.BASE_URL}...")
     try:
-        await page.goto(CONFIG.BASE_URL)
-        await page.wait_for_load_state("networkidle")
+        await open_dashboard(page)
     except Exception as e:
-        print(f"Navigation failed: {e}")
+        log(f"Navigation failed: {e}")
         return
 
     # Capture downloads
@@ -129,30 +504,34 @@ async def process_card(page, context, card_title, output_folder, force_update=Fa
     try:
         # 1. Click 'View' button
         try:
-            if container_selector:
-                view_button_selector = f"xpath={container_selector}//h5[contains(normalize-space(text()), '{card_title}')]/ancestor::a"
-            else:
-                view_button_selector = f"xpath=//h5[contains(normalize-space(text()), '{card_title}')]/ancestor::a"
-            
-            if not await page.query_selector(view_button_selector):
-                print(f"Card '{card_title}' not found on page. Skipping.")
+            # Titles come from the live page, so they are matched as text (a
+            # case-sensitive substring, as before) rather than spliced into XPath
+            scope = page.locator(f"xpath={container_selector}") if container_selector else page
+            title_h5 = page.locator("h5", has_text=re.compile(re.escape(card_title)))
+            view_button = scope.locator("a", has=title_h5).first
+
+            if not await view_button.count():
+                log(f"Card '{card_title}' not found on page. Skipping.")
                 return
 
-            await page.click(view_button_selector)
-            await page.wait_for_timeout(CONFIG.TIMEOUTS["post_click"]) 
+            await view_button.click()
         except Exception as e:
-            print(f"Could not find or click view button for {card_title}: {e}")
+            log(f"Could not find or click view button for {card_title}: {e}")
             return
 
-        # Wait for either table or PDF load
+        # Wait for either table rows or an embedded PDF
         try:
-            await page.wait_for_selector("#itcdetails", timeout=CONFIG.TIMEOUTS["page_load"])
-        except Exception as e:
-            print(f"Table (#itcdetails) did not load for {card_title}. Checking for download, direct PDF, or new tab...")
+            await page.wait_for_selector("#itcdetails tbody tr, embed[type='application/pdf']", timeout=CONFIG.TIMEOUTS["page_load"])
+            table_loaded = await page.query_selector("#itcdetails tbody tr") is not None
+        except Exception:
+            table_loaded = False
+
+        if not table_loaded:
+            log(f"Table (#itcdetails) did not load for {card_title}. Checking for download, direct PDF, or new tab...")
             
             # 0. Check for Downloads
             if downloads:
-                print(f"Detected {len(downloads)} download event(s).")
+                log(f"Detected {len(downloads)} download event(s).")
                 for download in downloads:
                     try:
                         filename = sanitize_filename(card_title) + ".pdf"
@@ -160,197 +539,230 @@ async def process_card(page, context, card_title, output_folder, force_update=Fa
                              filename = filename[:CONFIG.MAX_FILENAME_LENGTH] + ".pdf"
                         filepath = os.path.join(folder_path, filename)
                         
-                        if os.path.exists(filepath) and not force_update:
-                             print(f"Skipping {filename} (already exists)")
+                        if filename in existing and not force_update:
+                             log(f"Skipping {filename} (already exists)")
                              continue
                         
-                        print(f"Saving download to {filepath}...")
+                        log(f"Saving download to {filepath}...")
                         await download.save_as(filepath)
-                        print(f"Saved {filename}")
+                        existing.add(filename)
+                        log(f"Saved {filename}")
                     except Exception as e:
-                        print(f"Download save failed: {e}")
+                        log(f"Download save failed: {e}")
+                        failed = True
+                if record:
+                    await record_card(folder_path, card_title, {}, complete=not failed)
                 return
 
             # 1. Check if CURRENT page is a PDF
-            if page.url.lower().endswith(".pdf") or "pdf" in page.url.lower() or "/website/" in page.url.lower():
-                 print(f"Detected direct PDF on current page: {page.url}")
-                 filename = sanitize_filename(card_title) + ".pdf"
-                 filepath = os.path.join(folder_path, filename)
-
-                 if os.path.exists(filepath) and not force_update:
-                     print(f"Skipping {filename} (already exists)")
+            if _is_pdf_url(page.url):
+                 log(f"Detected direct PDF on current page: {page.url}")
+                 if card_pdf in existing and not force_update:
+                     log(f"Skipping {card_pdf} (already exists)")
+                 elif await download_pdf_from_url(page, page.url, os.path.join(folder_path, card_pdf)):
+                     log(f"Saved {card_pdf}")
+                 else:
                      return
-
-                 if await download_pdf_from_url(page, page.url, filepath):
-                     print(f"Saved {filename}")
+                 if record:
+                     await record_card(folder_path, card_title, {})
                  return
 
             # 2. Check for NEW tab
-            found_in_tab = False
-            for subpage in context.pages:
-                if subpage == page: continue
-                
-                try:
-                    await subpage.wait_for_load_state("domcontentloaded", timeout=CONFIG.TIMEOUTS["page_load"])
-                except Exception:
-                    pass
-                    
-                print(f"Checking new tab: {subpage.url}")
-                if subpage.url.lower().endswith(".pdf") or "pdf" in subpage.url.lower() or "/website/" in subpage.url.lower():
-                    print("Detected PDF in new tab.")
-                    filename = sanitize_filename(card_title) + ".pdf"
-                    filepath = os.path.join(folder_path, filename)
-                    
-                    if os.path.exists(filepath) and not force_update:
-                        print(f"Skipping {filename} (already exists)")
-                        found_in_tab = True
-                        break
-
-                    print(f"Downloading {subpage.url} to {filename}...")
-                    if await download_pdf_from_url(subpage, subpage.url, filepath):
-                        print(f"Saved {filename}")
-                        found_in_tab = True
-                        break
-            
-            if found_in_tab:
-                return
-
-            print(f"Could not find table or PDF for {card_title}")
+            await popups.settle()
+            if popups.pdf_seen:
+                log("Detected PDF in new tab.")
+                found_in_tab = bool(popups.saved)
+                if found_in_tab:
+                    log(f"Saved {card_pdf}")
+                elif card_pdf in existing and not force_update:
+                    log(f"Skipping {card_pdf} (already exists)")
+                    found_in_tab = True
+                if found_in_tab:
+                    if record:
+                        await record_card(folder_path, card_title, {})
+                    return
+
+            log(f"Could not find table or PDF for {card_title}")
             return
 
-        # Setup window.open interception for blob downloads
-        await page.evaluate("""
-            window._opened_urls = [];
-            const originalOpen = window.open;
-            window.open = (url, target, features) => {
-                window._opened_urls.push(url);
-                return originalOpen(url, target, features);
-            }
-        """)
+        # Row links open blob: tabs; the blob is fetched from this page, so the
+        # popup handler only has to close them.
+        popups.target = None
 
         page_num = 1
         processed_count = 0
+        prefix = card_title.replace(' ', '_').replace('ITC(HS)_based_', '').replace('Details', '').strip('_')
+        saved: Dict[str, dict] = {}
+        row_locator = page.locator("#itcdetails tbody tr")
+        next_item = page.locator("li.next:has(a)").first
+
+        def row_filename(row):
+            safe_col0 = sanitize_filename(row["col0"])
+            safe_col1 = sanitize_filename(row["col1"])
+            filename = f"{prefix}_{safe_col0}_{safe_col1}.pdf"
+            if len(filename) > CONFIG.MAX_FILENAME_LENGTH:
+                filename = filename[:CONFIG.MAX_FILENAME_LENGTH] + ".pdf"
+            return filename
+
+        def mark_saved(row, filename, filepath):
+            nonlocal processed_count
+            log(f"Saved {filename}")
+            processed_count += 1
+            existing.add(filename)
+            saved[filename] = {"card": card_title, "col0": row["col0"], "col1": row["col1"],
+                               "mtime": os.path.getmtime(filepath)}
+
+        async def fetch_direct(row, filename, filepath):
+            nonlocal failed
+            async with download_slots:
+                log(f"Downloading {filename}...")
+                if await download_pdf_from_url(page, row["href"], filepath):
+                    mark_saved(row, filename, filepath)
+                else:
+                    failed = True
+
+        def already_saved(row, filename):
+            return filename in existing or scraped.get((card_title, row["col0"], row["col1"])) in existing
+
+        # The next-button loop below stays as the fallback, and simply finds
+        # no next page once every row is shown.
+        try:
+            if await asyncio.wait_for(page.evaluate(SHOW_ALL_ROWS_JS), CONFIG.TIMEOUTS["page_load"] / 1000):
+                log("Showing all rows on one page.")
+        except Exception as e:
+            log(f"Could not switch the table to a single page ({e}); paginating instead.")
         
         while True:
-            print(f"Processing page {page_num}...")
-            await page.wait_for_timeout(CONFIG.TIMEOUTS["row_render"])
-
-            rows = await page.query_selector_all("#itcdetails tbody tr")
-            if not rows:
-                print("No rows found in table.")
+            log(f"Processing page {page_num}...")
+            try:
+                await page.wait_for_selector("#itcdetails tbody tr:nth-child(1)", state="visible", timeout=CONFIG.TIMEOUTS["row_render"])
+            except Exception:
+                pass
+
+            snapshot = await page.eval_on_selector_all("#itcdetails tbody tr", ROW_SNAPSHOT_JS, [link_selector, target_chapter])
+            if not snapshot["count"]:
+                log("No rows found in table.")
+                failed = True
                 break
-
-            row_count = len(rows)
-            for i in range(row_count):
-                # Re-query rows to avoid stale element reference
-                rows = await page.query_selector_all("#itcdetails tbody tr")
-                if i >= len(rows): break
-                row = rows[i]
-
-                cols = await row.query_selector_all("td")
-                if len(cols) < 2:
-                    continue
-
-                col0_text = (await cols[0].inner_text()).strip()
-                col1_text = (await cols[1].inner_text()).strip()
-
-                if target_chapter and col0_text != target_chapter:
-                    continue
-
-                safe_col0 = sanitize_filename(col0_text)
-                safe_col1 = sanitize_filename(col1_text)
-                
-                # Construct filename
-                prefix = card_title.replace(' ', '_').replace('ITC(HS)_based_', '').replace('Details', '').strip('_')
-                filename = f"{prefix}_{safe_col0}_{safe_col1}.pdf"
-                
-                if len(filename) > CONFIG.MAX_FILENAME_LENGTH:
-                     filename = filename[:CONFIG.MAX_FILENAME_LENGTH] + ".pdf"
-
+            rows = snapshot["rows"]
+
+            # A card finished on an earlier run whose first page has nothing
+            # new is assumed unchanged; skip paging through the rest of it.
+            if page_num == 1 and seen_before and record and not force_update:
+                if all(already_saved(row, row_filename(row)) for row in rows):
+                    log(f"All files on the first page of {card_title} already present, skipping pagination.")
+                    await record_card(folder_path, card_title, {})
+                    return
+
+            direct = []  # (row, filename, filepath) for rows with a plain href
+            target_done = False
+            for row in rows:
+                col0_text = row["col0"]
+
+                filename = row_filename(row)
                 filepath = os.path.join(folder_path, filename)
 
-                if os.path.exists(filepath) and not force_update:
-                    print(f"Skipping {filename} (already exists)")
+                # Checked before the click, so cached rows cost no browser round-trips
+                if already_saved(row, filename) and not force_update:
+                    log(f"Skipping {filename} (already exists)")
                     continue
 
-                # Find PDF link
+                # Locators resolve at click time. The row is found by its first
+                # two cells rather than its position, so a redraw or a reordered
+                # tbody can't point the click at another row's link.
                 pdf_link = None
-                if link_selector:
-                    pdf_link = await row.query_selector(link_selector)
-                else:
-                    pdf_link = await row.query_selector("a i.fa-file-pdf")
-                    if not pdf_link:
-                        try:
-                            last_col = cols[-1]
-                            pdf_link = await last_col.query_selector("a")
-                        except Exception:
-                            pass
-
-                if pdf_link:
-                    try:
-                        tag_name = await pdf_link.evaluate("el => el.tagName")
-                        if tag_name == "I":
-                            parent_handle = await pdf_link.evaluate_handle("el => el.closest('a')")
-                            if parent_handle:
-                                pdf_link = parent_handle.as_element() 
-                    except Exception as e:
-                        pass
+                if row["link"]:
+                    pdf_link = (row_locator
+                                .filter(has=page.locator(":scope > :nth-child(1)", has_text=_exact_text_re(row["col0"])))
+                                .filter(has=page.locator(":scope > :nth-child(2)", has_text=_exact_text_re(row["col1"])))
+                                .first.locator(row["link"]).first)
                 
-                if pdf_link:
-                    print(f"Downloading {filename}...")
-                    await page.evaluate("window._opened_urls = []")
+                if row["href"]:
+                    # Plain link: fetched below without a click or blob round-trip
+                    direct.append((row, filename, filepath))
+                elif pdf_link:
+                    log(f"Downloading {filename}...")
+                    response_future = popups.expect_pdf_response()
+                    blob_future = popups.expect_blob()
                     
                     try:
-                        await pdf_link.click()
+                        await rate_limiter.acquire()
+                        await pdf_link.click(timeout=CONFIG.TIMEOUTS["click"])
                     except Exception as e:
-                        print(f"Failed to click PDF link for {filename}: {e}")
+                        log(f"Failed to click PDF link for {filename}: {e}")
+                        failed = True
                         continue
 
-                    # Poll for window.open / blob
-                    blob_url = None
-                    for _ in range(CONFIG.BLOB_POLL_ATTEMPTS): 
-                        await page.wait_for_timeout(CONFIG.TIMEOUTS["poll_interval"])
-                        captured = await page.evaluate("window._opened_urls")
-                        blobs = [u for u in captured if u and u.startswith("blob:")]
-                        if blobs:
-                            blob_url = blobs[0]
-                            break
-                    
-                    if blob_url:
-                        if await download_pdf_from_url(page, blob_url, filepath):
-                             print(f"Saved {filename}")
-                             processed_count += 1
+                    # The page fetches the PDF and wraps it in a blob before calling
+                    # window.open; either signal ends the wait.
+                    await asyncio.wait({response_future, blob_future}, timeout=CONFIG.TIMEOUTS["blob_capture"] / 1000,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                    if response_future.done() and not blob_future.done():
+                        # Let this click's window.open land now, so it cannot
+                        # resolve the next row's future instead
+                        await asyncio.wait({blob_future}, timeout=CONFIG.TIMEOUTS["blob_grace"] / 1000)
+                    blob_url = blob_future.result() if blob_future.done() else None
+
+                    ok = False
+                    if response_future.done():
+                        # Save the raw response body; no blob read-back through the page
+                        try:
+                            await write_pdf(filepath, await response_future.result().body())
+                            ok = True
+                        except Exception as e:
+                            log(f"Could not save PDF response for {filename}: {e}")
+                    if not ok and blob_url:
+                        ok = await download_pdf_from_url(page, blob_url, filepath)
+
+                    if ok:
+                        mark_saved(row, filename, filepath)
                     else:
-                        print(f"No blob URL captured for {filename}")
-
-                    # Cleanup any extra tabs that might have opened
-                    await cleanup_extra_pages(context, page)
+                        failed = True
+                        if not blob_url and not response_future.done():
+                            log(f"No blob URL captured for {filename}")
                 else:
-                    print(f"No PDF link found for row: {col0_text}")
+                    log(f"No PDF link found for row: {col0_text}")
                 
                 if target_chapter and col0_text == target_chapter:
-                    print(f"Target '{target_chapter}' processed.")
-                    return 
+                    target_done = True
+                    break
+
+            # Direct links don't need the page, so this page's batch is fetched side by side
+            await asyncio.gather(*(fetch_direct(*item) for item in direct))
+            if target_done:
+                log(f"Target '{target_chapter}' processed.")
+                return
 
             # Pagination
-            next_button = await page.query_selector("li.next a")
             should_continue = False
-            if next_button:
+            if await next_item.count():
                 try:
-                    is_disabled = await page.evaluate("(el) => el.parentElement.classList.contains('disabled')", next_button)
-                    if not is_disabled:
-                        print("Moving to next page...")
-                        await next_button.click()
+                    if "disabled" not in (await next_item.get_attribute("class") or "").split():
+                        log("Moving to next page...")
+                        # The old rows are detached on redraw; wait for that
+                        # instead of sleeping so the next pass sees fresh rows.
+                        first_row = await page.query_selector("#itcdetails tbody tr")
+                        await rate_limiter.acquire()
+                        await next_item.locator("a").first.click()
+                        if first_row:
+                            try:
+                                await first_row.wait_for_element_state("hidden", timeout=CONFIG.TIMEOUTS["row_render"])
+                            except Exception:
+                                pass
                         page_num += 1
                         should_continue = True
                 except Exception:
                     pass
             
             if not should_continue:
-                print("Reached last page.")
+                log("Reached last page.")
                 break
                 
-        print(f"Finished {card_title}. Processed: {processed_count}")
+        log(f"Finished {card_title}. Processed: {processed_count}")
+        if record:
+            if failed:
+                log(f"Some rows of {card_title} failed; it will be retried on the next run.")
+            await record_card(folder_path, card_title, saved, complete=not failed)
 
     finally:
         # Removal of event listener
@@ -358,10 +770,8 @@ async def process_card(page, context, card_title, output_folder, force_update=Fa
             page.remove_listener("download", handle_download)
         except Exception:
             pass
-        # Final cleanup of pages
-        await cleanup_extra_pages(context, page)
 
-async def main():
+def parse_args(argv: Optional[List[str]] = None) -> RunOptions:
     parser = argparse.ArgumentParser(description="Extract DGFT ITC(HS) Policy & Appendix PDFs.")
     parser.add_argument("-f", "--force", action="store_true", help="Force overwrite existing files")
     parser.add_argument("-c", "--chapter", help="Specific ID/S.No to download")
@@ -369,50 +779,148 @@ async def main():
     parser.add_argument("--skip-extras", action="store_true", help="Skip downloading extra Appendices/Notifications")
     parser.add_argument("--only-extras", action="store_true", help="Download ONLY extra Appendices/Notifications (skips main policy)")
     parser.add_argument("-s", "--section", help="Filter by specific section name")
-    args = parser.parse_args()
+    return RunOptions(**vars(parser.parse_args(argv)))
+
+async def main(args: RunOptions, on_log: Optional[Callable[[str], None]] = None):
+    """
+    Run the extractor. on_log receives every log line (default: stdout), which
+    lets the dashboard run this as a task in its own event loop.
+    """
+    if on_log is not None:
+        _log_sink.set(on_log)
+
+    if args.skip_extras and args.only_extras:
+        log("Error: Cannot use --skip-extras and --only-extras together.")
+        return
 
     if not os.path.exists(CONFIG.DOWNLOAD_DIR):
         os.makedirs(CONFIG.DOWNLOAD_DIR, exist_ok=True)
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(accept_downloads=True)
-        page = await context.new_page()
+    def should_process(title):
+        if not args.section:
+            return True
+        return args.section.lower() in title.lower()
 
-        def should_process(title):
-            if not args.section:
-                return True
-            return args.section.lower() in title.lower()
+    import_container = '//h4[contains(normalize-space(.), "Schedule 1 - Import Policy")]/ancestor::div[contains(@class, "bg-dark-gray")][1]'
+    export_container = '//h4[contains(normalize-space(.), "Schedule 2 - Export Policy")]/ancestor::div[contains(@class, "bg-dark-gray")][1]'
 
-        if args.skip_extras and args.only_extras:
-            print("Error: Cannot use --skip-extras and --only-extras together.")
-            return
+    def plan_cards(import_extras, export_extras):
+        # (card_title, output_folder, link_selector, container_selector)
+        cards = []
 
         # Import Policy
         if args.policy in ['import', 'all']:
-            import_container = '//h4[contains(normalize-space(.), "Schedule 1 - Import Policy")]/ancestor::div[contains(@class, "bg-dark-gray")][1]'
-            
             if not args.only_extras and should_process("ITC(HS) based Import Policy"):
-                await process_card(page, context, "ITC(HS) based Import Policy", "Import_Policy", args.force, args.chapter, link_selector="a.itchsimport", container_selector=import_container)
-            
+                cards.append(("ITC(HS) based Import Policy", "Import_Policy", "a.itchsimport", import_container))
+
             if not args.skip_extras:
-                for item in IMPORT_EXTRA_ITEMS:
+                for item in import_extras:
                     if should_process(item):
-                        await process_card(page, context, item, "Import_Policy_Extra", args.force, args.chapter, container_selector=import_container)
-        
+                        cards.append((item, "Import_Policy_Extra", None, import_container))
+
         # Export Policy
         if args.policy in ['export', 'all']:
-            export_container = '//h4[contains(normalize-space(.), "Schedule 2 - Export Policy")]/ancestor::div[contains(@class, "bg-dark-gray")][1]'
-
             if not args.only_extras and should_process("ITC(HS) based Export Policy"):
-                await process_card(page, context, "ITC(HS) based Export Policy", "Export_Policy", args.force, args.chapter, link_selector="a.itchsexport", container_selector=export_container)
-            
+                cards.append(("ITC(HS) based Export Policy", "Export_Policy", "a.itchsexport", export_container))
+
             if not args.skip_extras:
-                for item in EXPORT_EXTRA_ITEMS:
+                for item in export_extras:
                     if should_process(item):
-                        await process_card(page, context, item, "Export_Policy_Extra", args.force, args.chapter, container_selector=export_container)
+                        cards.append((item, "Export_Policy_Extra", None, export_container))
+
+        # Cards completed within MANIFEST_TTL are skipped
+        if args.force or args.chapter:
+            return cards
+        pending = []
+        for card in cards:
+            folder_path = os.path.join(CONFIG.DOWNLOAD_DIR, card[1])
+            if folder_path not in manifests:
+                manifests[folder_path] = load_manifest(folder_path)
+            if not card_is_fresh(manifests[folder_path], card[0]):
+                pending.append(card)
+            elif card[:2] not in reported:
+                reported.add(card[:2])
+                log(f"Skipping {card[0]} (completed recently, see {MANIFEST_NAME})")
+        return pending
+
+    def known_extras(folder, builtin):
+        # Titles read from the dashboard on an earlier run, if any
+        return load_manifest(os.path.join(CONFIG.DOWNLOAD_DIR, folder)).get("discovered") or builtin
+
+    manifests: Dict[str, dict] = {}
+    reported = set()
+    # Planned from the last known card lists first, so a run with nothing
+    # stale exits without starting Chromium
+    if not plan_cards(known_extras("Import_Policy_Extra", IMPORT_EXTRA_ITEMS),
+                      known_extras("Export_Policy_Extra", EXPORT_EXTRA_ITEMS)):
+        log("Nothing to do.")
+        return
 
-        await browser.close()
+    connector = aiohttp.TCPConnector(limit_per_host=CONFIG.MAX_PARALLEL_DOWNLOADS)
+    timeout = aiohttp.ClientTimeout(total=CONFIG.TIMEOUTS["download"] / 1000)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        # Set before Playwright starts: its dispatcher task copies the context
+        # on entry, and popup handlers run there.
+        _http_session.set(http)
+        async with async_playwright() as p:
+            # One persistent context for the run, so the site's session cookies are
+            # shared by every worker and survive into the next run. The workers get
+            # their own page plus popup handler.
+            context = await p.chromium.launch_persistent_context(
+                CONFIG.PROFILE_DIR, headless=True, accept_downloads=True, args=list(CONFIG.BROWSER_ARGS)
+            )
+            try:
+                await context.route(_ASSET_URL_RE, _block_assets)
+
+                async def new_worker_page():
+                    page = await context.new_page()
+                    popups = PopupHandler(page)
+                    await popups.watch_blobs()
+                    return page, popups
+
+                # The dashboard lists the cards each schedule currently has; read
+                # them once, in the page the first worker then starts from.
+                first = await new_worker_page()
+                discovered: Dict[str, List[str]] = {}
+                try:
+                    await open_dashboard(first[0])
+                    discovered["Import_Policy_Extra"] = await discover_cards(first[0], import_container, "ITC(HS) based Import Policy")
+                    discovered["Export_Policy_Extra"] = await discover_cards(first[0], export_container, "ITC(HS) based Export Policy")
+                except Exception as e:
+                    log(f"Could not read the card list ({e}); using the last known one.")
+                # Kept for the next run's pre-launch check
+                for folder, titles in discovered.items():
+                    if titles:
+                        await record_discovered(os.path.join(CONFIG.DOWNLOAD_DIR, folder), titles)
+                cards = plan_cards(discovered.get("Import_Policy_Extra") or known_extras("Import_Policy_Extra", IMPORT_EXTRA_ITEMS),
+                                   discovered.get("Export_Policy_Extra") or known_extras("Export_Policy_Extra", EXPORT_EXTRA_ITEMS))
+                if not cards:
+                    log("Nothing to do.")
+                    return
+
+                queue: asyncio.Queue = asyncio.Queue()
+                for card in cards:
+                    queue.put_nowait(card)
+
+                async def worker(prepared=None):
+                    # A worker keeps its page for all of its cards, so only its first
+                    # card pays for a cold load of the dashboard.
+                    page, popups = prepared or await new_worker_page()
+                    try:
+                        while not queue.empty():
+                            card_title, output_folder, link_selector, container_selector = queue.get_nowait()
+                            try:
+                                await process_card(page, popups, card_title, output_folder, args.force, args.chapter, link_selector=link_selector, container_selector=container_selector)
+                            except Exception as e:
+                                log(f"Card '{card_title}' failed: {e}")
+                    finally:
+                        await page.close()
+
+                extra_workers = min(CONFIG.MAX_PARALLEL_CARDS, len(cards)) - 1
+                await asyncio.gather(worker(first), *(worker() for _ in range(extra_workers)))
+            finally:
+                # Also runs when the dashboard cancels the job
+                await context.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))